@@ -0,0 +1,29 @@
+import hashlib
+
+# Optional xxhash support (much faster than any cryptographic hash)
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# Per-object digests only detect corruption; the checkpoint ID itself
+# stays SHA-256. The algorithm is recorded so either side can verify.
+DIGEST_ALGO = "xxh3_128" if xxhash is not None else "blake2b_128"
+
+
+def object_digest(data, algo: str = DIGEST_ALGO) -> str | None:
+    """
+    Hex digest of one serialized object.
+    Returns None if algo is not available in this environment.
+    """
+    if algo == "xxh3_128":
+        if xxhash is None:
+            return None
+        # One-shot call: no hasher object is allocated per object
+        return xxhash.xxh3_128_hexdigest(data)
+
+    if algo == "blake2b_128":
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    return None
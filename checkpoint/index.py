@@ -0,0 +1,144 @@
+import json
+from collections.abc import Mapping
+
+import msgpack
+
+from .exceptions import CorruptCheckpointError
+
+
+# objects.idx is stored column-wise: one list per field shared by every
+# entry, plus per-entry extras (array dtype, shape, codec...) only where
+# present. The table is msgpack-encoded. Version 1 was a JSON
+# {name: entry} dict and is still read.
+INDEX_FORMAT = 2
+
+# Fields every entry has, in column order
+_COLUMNS = ("offset", "length", "type", "hash", "algo")
+
+# Entry fields that decide how an object's bytes are decoded. The bytes
+# alone do not determine them, so (from schema v2 on) they are hashed
+# into the checkpoint ID along with the blob.
+LAYOUT_FIELDS = (
+    "type", "dtype", "shape", "order", "stored_dtype", "scale", "codec",
+    "uncompressed",
+)
+
+# Fields hashed into the ID per manifest schema. v3 adds where each
+# variable's bytes are: with deduplication, the unique chunks alone do
+# not say which one a variable points at.
+SCHEMA_FIELDS = {
+    "v2": LAYOUT_FIELDS,
+    "v3": LAYOUT_FIELDS + ("offset", "length"),
+}
+CURRENT_SCHEMA = "v3"
+
+
+def pack_index(entries: Mapping) -> dict:
+    """Convert {name: entry} into the columnar objects.idx table."""
+    names = list(entries)
+    table = {"format": INDEX_FORMAT, "names": names}
+    for col in _COLUMNS:
+        table[col] = [entries[name].get(col) for name in names]
+
+    extra = {}
+    for name in names:
+        rest = {k: v for k, v in entries[name].items() if k not in _COLUMNS}
+        if rest:
+            extra[name] = rest
+    table["extra"] = extra
+    return table
+
+
+class ObjectIndex(Mapping):
+    """
+    Read-only {name: entry} view of a columnar objects.idx table.
+    Entries are assembled once, when the index is loaded.
+    """
+
+    def __init__(self, table: dict):
+        try:
+            names = table["names"]
+            columns = [table[col] for col in _COLUMNS]
+            extra = table.get("extra", {})
+        except (KeyError, TypeError):
+            raise CorruptCheckpointError("Malformed objects.idx")
+
+        if any(len(column) != len(names) for column in columns):
+            raise CorruptCheckpointError("Malformed objects.idx")
+
+        self._entries = {
+            name: dict(zip(_COLUMNS, row))
+            for name, row in zip(names, zip(*columns))
+        }
+        try:
+            for name, fields in extra.items():
+                self._entries[name].update(fields)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise CorruptCheckpointError("Malformed objects.idx")
+
+    def __getitem__(self, name):
+        return self._entries[name]
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def load_index(table: dict) -> Mapping:
+    """Wrap a decoded objects.idx; legacy dicts are returned as is."""
+    if table.get("format") == INDEX_FORMAT:
+        return ObjectIndex(table)
+    return table
+
+
+def layout_bytes(entries, schema: str = CURRENT_SCHEMA) -> bytes:
+    """
+    Canonical encoding of the ID-covered fields of entries (in manifest
+    order) for the given schema.
+    """
+    fields = SCHEMA_FIELDS[schema]
+    if schema == "v2":
+        layout = [
+            {field: entry[field] for field in fields if field in entry}
+            for entry in entries
+        ]
+        return json.dumps(layout, sort_keys=True, separators=(",", ":")).encode()
+
+    # One row per entry in fixed field order; no field is ever None, so
+    # None unambiguously marks an absent one.
+    rows = [[entry.get(field) for field in fields] for entry in entries]
+    return msgpack.packb(rows, use_bin_type=True)
+
+
+def encode_index(entries: Mapping) -> bytes:
+    return msgpack.packb(pack_index(entries), use_bin_type=True)
+
+
+def read_index(path: str) -> Mapping:
+    """Read objects.idx at path as a {name: entry} mapping."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    try:
+        # A msgpack map never starts with "{"; legacy indexes are JSON
+        if data[:1] == b"{":
+            table = json.loads(data)
+        else:
+            table = msgpack.unpackb(data, raw=False)
+    except ValueError:
+        raise CorruptCheckpointError("Malformed objects.idx")
+
+    if not isinstance(table, dict):
+        raise CorruptCheckpointError("Malformed objects.idx")
+    return load_index(table)
+
+
+def write_index(path: str, entries: Mapping):
+    """Write {name: entry} to path in the current objects.idx format."""
+    with open(path, "wb") as f:
+        f.write(encode_index(entries))
@@ -1,9 +1,12 @@
 import os
 import json
 import hashlib
+import mmap
 import msgpack
 import io
 
+from .digest import object_digest
+from .index import SCHEMA_FIELDS, layout_bytes, read_index
 from .exceptions import ChecksumMismatchError, CorruptCheckpointError
 
 # Optional NumPy support
@@ -12,89 +15,294 @@ try:
 except ImportError:
     np = None
 
+# Optional LZ4 support (compressed arrays)
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Optional msgspec decoder (single C pass, faster than msgpack.unpackb)
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+if msgspec is not None:
+    _unpackb = msgspec.msgpack.Decoder().decode
+    _DECODE_ERRORS = (ValueError, TypeError, msgspec.DecodeError)
+else:
+    def _unpackb(data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    _DECODE_ERRORS = (ValueError, TypeError)
+
+
+# v1 IDs cover manifest + blob; later schemas also cover the entry
+# fields listed in SCHEMA_FIELDS
+_SCHEMAS = ("v1",) + tuple(SCHEMA_FIELDS)
+
+
+# mmap_mode -> access for the objects.bin mapping (as in np.load)
+_MMAP_ACCESS = {
+    None: mmap.ACCESS_READ,
+    "r": mmap.ACCESS_READ,
+    "c": mmap.ACCESS_COPY,
+}
+
+
+def _map_blob(f, access=mmap.ACCESS_READ):
+    """Map objects.bin; mmap refuses empty files."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return None
+    return mmap.mmap(f.fileno(), 0, access=access)
+
+
+# Raw dtypes of quantized float32 arrays
+_STORED_DTYPES = {"bf16": "<u2", "int8": "|i1"}
+
+
+def _dequantize(arr, entry):
+    if entry["stored_dtype"] == "bf16":
+        return (arr.astype(np.uint32) << 16).view(np.float32)
+    return arr.astype(np.float32) * np.float32(entry["scale"])
+
+
+def _digest_file(f, h):
+    """Feed the rest of binary file f into hash object h."""
+    if hasattr(hashlib, "file_digest"):  # Python 3.11+, GIL-free C loop
+        hashlib.file_digest(f, lambda: h)
+        return
+    for block in iter(lambda: f.read(1 << 18), b""):
+        h.update(block)
+
+
+def _load_array(data, entry, copy=True):
+    """
+    Rebuild an array from raw bytes and its idx dtype/shape.
+    With copy=False, plain stored arrays are returned as views of data.
+    """
+    dtype = np.lib.format.descr_to_dtype(entry["dtype"])
+    if dtype.hasobject:
+        raise CorruptCheckpointError("Object arrays cannot be restored")
+
+    stored = entry.get("stored_dtype")
+    if stored is not None:
+        if stored not in _STORED_DTYPES:
+            raise CorruptCheckpointError(f"Unknown stored dtype '{stored}'")
+        dtype = np.dtype(_STORED_DTYPES[stored])
+
+    order = entry.get("order", "C")
+    codec = entry.get("codec")
+    if codec is None:
+        if stored is None and not copy:
+            # View a fresh slice so the caller may still release data
+            arr = np.frombuffer(data[:], dtype=dtype)
+            return arr.reshape(entry["shape"], order=order)
+        arr = np.frombuffer(data, dtype=dtype).reshape(entry["shape"], order=order)
+        if stored is None:
+            # Copy out so the result does not pin the mapping
+            return arr.copy(order="K")
+    elif codec == "lz4":
+        if lz4 is None:
+            raise CorruptCheckpointError("lz4 not available to restore array")
+        # Decompressed into a fresh bytearray, so no further copy is needed
+        raw = lz4.frame.decompress(data, return_bytearray=True)
+        arr = np.frombuffer(raw, dtype=dtype).reshape(entry["shape"], order=order)
+    else:
+        raise CorruptCheckpointError(f"Unknown array codec '{codec}'")
+
+    # Dequantizing allocates a new array, so it never aliases the mapping
+    return _dequantize(arr, entry) if stored is not None else arr
+
+
+def _load_npy(data):
+    """
+    Decode a legacy .npy payload straight from a buffer.
+    Only the header is copied; the array data is read in place.
+    """
+    major, minor = data[6], data[7]
+    if (major, minor) not in ((1, 0), (2, 0)):
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+    size_len = 2 if major == 1 else 4
+    header_len = int.from_bytes(data[8 : 8 + size_len], "little")
+    data_start = 8 + size_len + header_len
+
+    fp = io.BytesIO(bytes(data[:data_start]))
+    np.lib.format.read_magic(fp)
+    if major == 1:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+
+    if dtype.hasobject:
+        raise CorruptCheckpointError("Object arrays cannot be restored")
+
+    count = 1
+    for dim in shape:
+        count *= dim
+
+    arr = np.frombuffer(data, dtype=dtype, count=count, offset=data_start)
+    arr = arr.reshape(shape, order="F" if fortran_order else "C")
+    # Copy out so the result does not pin the mapping
+    return arr.copy(order="K")
+
 
 def restore_checkpoint(
     checkpoint_path: str,
     target_namespace: dict,
     prefix: str | None = None,
+    mmap_mode: str | None = None,
 ):
     """
     Restore a checkpoint into target_namespace.
     Verifies integrity before deserialization.
+    mmap_mode "r" (read-only) or "c" (copy-on-write) returns uncompressed
+    arrays as views of objects.bin instead of copies, as in np.load.
     Returns list of restored variable names.
     """
+    if mmap_mode not in _MMAP_ACCESS:
+        raise ValueError(f"Unsupported mmap_mode: {mmap_mode!r}")
 
     # -----------------------------
     # 1. Load required files
     # -----------------------------
     try:
-        with open(os.path.join(checkpoint_path, "manifest.json")) as f:
-            manifest = json.load(f)
+        with open(os.path.join(checkpoint_path, "manifest.json"), "rb") as f:
+            manifest_bytes = f.read()
 
         with open(os.path.join(checkpoint_path, "metadata.json")) as f:
             metadata = json.load(f)
 
-        with open(os.path.join(checkpoint_path, "objects.idx")) as f:
-            objects_idx = json.load(f)
-
-        with open(os.path.join(checkpoint_path, "objects.bin"), "rb") as f:
-            objects_blob = f.read()
+        objects_idx = read_index(os.path.join(checkpoint_path, "objects.idx"))
 
         with open(os.path.join(checkpoint_path, "checksum.sha256")) as f:
             expected_checksum = f.read().strip()
 
+        blob_file = open(os.path.join(checkpoint_path, "objects.bin"), "rb")
+
     except FileNotFoundError as e:
         raise CorruptCheckpointError(f"Missing checkpoint file: {e}")
 
-    # -----------------------------
-    # 2. Verify checkpoint checksum
-    # -----------------------------
-    h = hashlib.sha256()
-    h.update(json.dumps(manifest, sort_keys=True).encode())
-    h.update(objects_blob)
+    with blob_file:
+        try:
+            manifest = json.loads(manifest_bytes)
+            schema = manifest["schema"]
+            variables = manifest["variables"]
+        except KeyError as e:
+            raise CorruptCheckpointError(f"Missing manifest field: {e}")
+        except (ValueError, TypeError) as e:
+            raise CorruptCheckpointError(f"Malformed manifest: {e}")
+        if schema not in _SCHEMAS:
+            raise CorruptCheckpointError(f"Unknown schema '{schema}'")
+
+        # Each index entry is looked up once, for the checksum and restore
+        try:
+            entries = [objects_idx[var] for var in variables]
+            if schema != "v1":
+                layout = layout_bytes(entries, schema)
+        except KeyError as e:
+            raise CorruptCheckpointError(
+                f"Missing index entry for variable {e}"
+            )
+        except (ValueError, TypeError, AttributeError) as e:
+            raise CorruptCheckpointError(f"Malformed index: {e}")
+
+        # -----------------------------
+        # 2. Verify checkpoint checksum
+        # -----------------------------
+        # The checksum covers the manifest exactly as stored on disk, then
+        # objects.bin streamed in fixed-size blocks (constant memory), then
+        # the index layout fields that decide how those bytes are decoded.
+        h = hashlib.sha256(manifest_bytes)
+        _digest_file(blob_file, h)
+        if schema != "v1":
+            h.update(layout)
+
+        if h.hexdigest() != expected_checksum:
+            raise ChecksumMismatchError("Checkpoint checksum mismatch")
+
+        # objects.bin is mapped rather than read, so restore never holds
+        # a full copy of the blob in memory.
+        mm = _map_blob(blob_file, _MMAP_ACCESS[mmap_mode])
+
+    blob = memoryview(mm if mm is not None else b"")
+    try:
+        return _restore_objects(
+            variables, entries, blob, target_namespace, prefix,
+            copy_arrays=mmap_mode is None,
+            copy_shared=mmap_mode == "c",
+        )
+    finally:
+        blob.release()
+        # Array views keep the mapping alive; it closes with the last one
+        if mm is not None and mmap_mode is None:
+            mm.close()
 
-    if h.hexdigest() != expected_checksum:
-        raise ChecksumMismatchError("Checkpoint checksum mismatch")
 
+def _restore_objects(
+    variables, entries, objects_blob, target_namespace, prefix, copy_arrays,
+    copy_shared=False,
+):
     # -----------------------------
     # 3. Restore variables
     # -----------------------------
     restored = []
+    # Deduplicated entries share bytes; writable (copy-on-write) views of
+    # them would alias, so only the first one may be a view.
+    viewed = set()
+
+    for var, entry in zip(variables, entries):
+        copy = copy_arrays
+        if copy_shared and not copy:
+            copy = entry.get("offset") in viewed
+            viewed.add(entry.get("offset"))
 
-    for var in manifest["variables"]:
-        if var not in objects_idx:
+        try:
+            value = _restore_entry(var, entry, objects_blob, copy)
+        except (KeyError, IndexError) + _DECODE_ERRORS as e:
+            # Malformed entry fields or payload (e.g. a shape that does
+            # not match the stored bytes)
             raise CorruptCheckpointError(
-                f"Missing index entry for variable '{var}'"
+                f"Cannot restore variable '{var}': {e!r}"
             )
 
-        entry = objects_idx[var]
-        offset = entry["offset"]
-        length = entry["length"]
-        expected_sha = entry["sha256"]
+        name = f"{prefix}{var}" if prefix else var
+        target_namespace[name] = value
+        restored.append(name)
 
-        data = objects_blob[offset : offset + length]
+    return restored
 
-        # Per-object integrity check
-        actual_sha = hashlib.sha256(data).hexdigest()
-        if actual_sha != expected_sha:
-            raise ChecksumMismatchError(
-                f"Object '{var}' failed integrity check"
-            )
 
-        # -----------------------------
-        # Deserialize based on type
-        # -----------------------------
+def _restore_entry(var, entry, objects_blob, copy_arrays):
+    offset = entry["offset"]
+    length = entry["length"]
+
+    # The blob itself is covered by the checkpoint checksum; offsets and
+    # lengths in the index are not, so they are checked here.
+    if offset < 0 or length < 0 or offset + length > len(objects_blob):
+        raise CorruptCheckpointError(
+            f"Index entry for variable '{var}' is out of bounds"
+        )
+
+    # -----------------------------
+    # Deserialize based on type
+    # -----------------------------
+    with objects_blob[offset : offset + length] as data:
+        # Per-object digest (skipped if its algorithm is unavailable)
+        if "hash" in entry:
+            actual = object_digest(data, entry.get("algo"))
+            if actual is not None and actual != entry["hash"]:
+                raise ChecksumMismatchError(
+                    f"Object '{var}' failed integrity check"
+                )
+
         if entry.get("type") == "numpy":
             if np is None:
                 raise CorruptCheckpointError(
                     "NumPy not available to restore array"
                 )
-            value = np.load(io.BytesIO(data), allow_pickle=False)
-        else:
-            value = msgpack.unpackb(data, raw=False)
-
-        name = f"{prefix}{var}" if prefix else var
-        target_namespace[name] = value
-        restored.append(name)
-
-    return restored
+            if "dtype" in entry:
+                return _load_array(data, entry, copy=copy_arrays)
+            return _load_npy(data)
+        return _unpackb(data)
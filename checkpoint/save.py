@@ -1,16 +1,24 @@
 import os
+import errno
+import mmap
 import json
 import hashlib
 import tempfile
+import contextlib
+import functools
 import shutil
 import msgpack
 from datetime import datetime, timezone
 import io
-import inspect
 import sys
+import types
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
+from .digest import DIGEST_ALGO, object_digest
+from .index import CURRENT_SCHEMA, encode_index, layout_bytes
 from .exceptions import UnserializableError, AtomicWriteError
 
 
@@ -20,6 +28,12 @@ try:
 except ImportError:
     np = None
 
+# Optional LZ4 support for large arrays
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
 
 # -----------------------------
 # Safe primitive types
@@ -33,38 +47,317 @@ def _is_numpy_array(obj):
     return isinstance(obj, np.ndarray)
 
 
-def _is_safe(obj):
-    # NumPy arrays (CPU only)
+# Lossy storage formats for float32 arrays (opt-in)
+_PRECISIONS = (None, "bf16", "int8")
+
+# Array compression codecs (opt-in; restore needs the same codec)
+_COMPRESSIONS = (None, "lz4")
+
+# With compression on, arrays above this size are compressed if that
+# saves at least 5%
+_COMPRESS_MIN_SIZE = 64 << 10
+_COMPRESS_MAX_RATIO = 0.95
+
+
+# Live runtime objects that can never be checkpointed, with the reason
+# reported for each; checked with one isinstance call before packing.
+_FORBIDDEN_REASONS = {
+    io.IOBase: "open file or stream",
+    types.GeneratorType: "generator",
+    types.FunctionType: "function",
+    types.ModuleType: "module",
+    types.FrameType: "stack frame",
+    types.TracebackType: "traceback",
+}
+_FORBIDDEN = tuple(_FORBIDDEN_REASONS)
+
+
+def _forbidden_reason(obj):
+    for typ, reason in _FORBIDDEN_REASONS.items():
+        if isinstance(obj, typ):
+            return f"{reason} cannot be checkpointed"
+
+
+def _reject(obj):
+    # msgpack default hook: anything it cannot pack natively is unsafe
+    if isinstance(obj, _FORBIDDEN):
+        raise TypeError(_forbidden_reason(obj))
+    if isinstance(obj, int):
+        raise OverflowError("integer out of 64-bit range")
+    raise TypeError(f"unsupported type {type(obj).__name__}")
+
+
+def _quantize(arr, precision):
+    """Lossy float32 -> bf16/int8; returns (stored array, idx fields)."""
+    if precision == "bf16":
+        # Keep the top 16 bits (sign, exponent, 7 mantissa bits)
+        bits = arr.view(np.uint32)
+        return (bits >> 16).astype("<u2"), {"stored_dtype": "bf16"}
+
+    # int8: symmetric per-tensor scale
+    absmax = float(np.max(np.abs(arr))) if arr.size else 0.0
+    if not np.isfinite(absmax):
+        raise ValueError("int8 quantization needs finite values")
+    scale = absmax / 127 or 1.0
+    q = np.round(arr / np.float32(scale)).astype(np.int8)
+    return q, {"stored_dtype": "int8", "scale": scale}
+
+
+def _serialize_numpy_array(arr, precision=None, compression=None):
+    """
+    Raw array bytes plus the dtype/shape needed to rebuild them.
+    The returned view aliases the array's memory; no copy is made
+    for C- or Fortran-contiguous input. With compression="lz4", large
+    compressible arrays come back compressed, tagged with a "codec" field.
+    float32 arrays are quantized first if a precision is requested.
+    """
+    # CPU only, no Python objects inside
+    if hasattr(arr, "device") and str(arr.device) != "cpu":
+        raise TypeError(f"array on device {arr.device}")
+    if arr.dtype.hasobject:
+        raise TypeError("object arrays are not supported")
+
+    meta = {
+        "dtype": np.lib.format.dtype_to_descr(arr.dtype),
+        "shape": list(arr.shape),
+    }
+    if precision is not None and arr.dtype == np.float32:
+        arr, stored = _quantize(arr, precision)
+        meta.update(stored)
+
+    # Fortran-ordered arrays are written in their own memory order
+    # rather than copied to C order first.
+    if arr.flags.f_contiguous and not arr.flags.c_contiguous:
+        meta["order"] = "F"
+        flat = arr.T.reshape(-1)
+    else:
+        flat = np.ascontiguousarray(arr).reshape(-1)
+    data = memoryview(flat.view(np.uint8))
+
+    # Large arrays are LZ4-compressed when that actually pays off
+    if compression == "lz4" and arr.nbytes > _COMPRESS_MIN_SIZE:
+        packed = lz4.frame.compress(data, compression_level=0)
+        if len(packed) < _COMPRESS_MAX_RATIO * arr.nbytes:
+            meta["codec"] = "lz4"
+            meta["uncompressed"] = arr.nbytes
+            return packed, meta
+
+    return data, meta
+
+
+def _serialize(obj, precision=None, compression=None):
+    """
+    Return (data, extra idx fields) for obj.
+    Raises TypeError/ValueError/OverflowError if obj is not checkpoint-safe.
+    """
+    if isinstance(obj, _FORBIDDEN):
+        raise TypeError(_forbidden_reason(obj))
     if _is_numpy_array(obj):
-        if hasattr(obj, "device") and str(obj.device) != "cpu":
-            return False
-        return True
+        return _serialize_numpy_array(obj, precision, compression)
 
-    if isinstance(obj, SAFE_PRIMITIVES):
-        return True
+    data = msgpack.packb(obj, use_bin_type=True, default=_reject)
+    if isinstance(obj, (dict, list, tuple)):
+        # msgpack packs any key, but a container key (e.g. a tuple, which
+        # comes back as a list) cannot be restored: check by decoding.
+        try:
+            msgpack.unpackb(data, raw=False, strict_map_key=False)
+        except TypeError:
+            raise TypeError("dict keys must be hashable scalars")
+    return data, {}
 
-    if isinstance(obj, list):
-        return all(_is_safe(x) for x in obj)
 
-    if isinstance(obj, tuple):
-        return all(_is_safe(x) for x in obj)
+def _serialize_with_digest(obj, precision=None, compression=None):
+    """_serialize plus the per-object digest, computed on the worker."""
+    data, extra = _serialize(obj, precision, compression)
+    return data, extra, object_digest(data)
 
-    if isinstance(obj, dict):
-        return all(isinstance(k, str) and _is_safe(v) for k, v in obj.items())
 
-    return False
+# Fixed for the life of the process
+_ENV_INFO = {
+    "python_version": sys.version,
+}
 
 
-def _serialize_numpy_array(arr):
-    buf = io.BytesIO()
-    np.save(buf, arr, allow_pickle=False)
-    return buf.getvalue()
+@functools.lru_cache(maxsize=8)
+def _git_commit(cwd):
+    """Short HEAD commit hash of cwd's repo (if any), looked up once per cwd."""
+    try:
+        out = subprocess.check_output(
+            ["git", "-C", cwd, "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            timeout=1,
+        )
+        return out.decode().strip()
+    except Exception:
+        return None
 
 
-def _serialize(obj):
-    if _is_numpy_array(obj):
-        return _serialize_numpy_array(obj)
-    return msgpack.packb(obj, use_bin_type=True)
+# The lookup for the import-time cwd starts right away in the background,
+# so its subprocess latency is usually hidden by the time the first
+# checkpoint is saved.
+try:
+    _GIT_PROBE_CWD = os.getcwd()
+except OSError:
+    _GIT_PROBE_CWD = None
+
+_git_probe = threading.Thread(
+    target=_git_commit, args=(_GIT_PROBE_CWD,), daemon=True
+)
+if _GIT_PROBE_CWD is not None:
+    _git_probe.start()
+
+
+def _current_git_commit():
+    """_git_commit for the current cwd, reusing the import-time probe."""
+    try:
+        cwd = os.getcwd()
+    except OSError:  # working directory was removed
+        return None
+    if cwd == _GIT_PROBE_CWD:
+        _git_probe.join()  # cached once the probe is done
+    return _git_commit(cwd)
+
+
+# Blobs at least this large are written with O_DIRECT (Linux)
+_DIRECT_IO_MIN_SIZE = 16 << 20
+_DIRECT_IO_ALIGN = 4096
+_DIRECT_IO_BUFFER = 8 << 20
+
+
+def _preallocate(fd, size):
+    """Reserve the full file size up front so it is not grown piecemeal."""
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError:
+            pass
+
+
+def _write_direct(fname, chunks, size):
+    """
+    Write chunks with O_DIRECT so a large blob bypasses the page cache.
+    Data is staged through a page-aligned buffer; the last block is
+    zero-padded and the file truncated back to size.
+    Returns the open file, or None if O_DIRECT is unavailable here.
+    """
+    if not hasattr(os, "O_DIRECT"):
+        return None
+
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT | os.O_CLOEXEC
+    try:
+        fd = os.open(fname, flags, 0o644)
+    except OSError as e:
+        if e.errno == errno.EINVAL:  # e.g. tmpfs
+            return None
+        raise
+
+    buf_size = min(_DIRECT_IO_BUFFER, -(-size // _DIRECT_IO_ALIGN) * _DIRECT_IO_ALIGN)
+    buf = mmap.mmap(-1, buf_size)  # anonymous maps are page-aligned
+    view = memoryview(buf)
+
+    def _flush(n):
+        done = 0
+        while done < n:
+            done += os.write(fd, view[done:n])
+
+    try:
+        _preallocate(fd, size)
+        fill = 0
+        for chunk in chunks:
+            with memoryview(chunk) as src:
+                pos = 0
+                while pos < len(src):
+                    n = min(len(src) - pos, buf_size - fill)
+                    view[fill : fill + n] = src[pos : pos + n]
+                    fill += n
+                    pos += n
+                    if fill == buf_size:
+                        _flush(fill)
+                        fill = 0
+        if fill:
+            padded = -(-fill // _DIRECT_IO_ALIGN) * _DIRECT_IO_ALIGN
+            view[fill:padded] = bytes(padded - fill)
+            _flush(padded)
+        os.ftruncate(fd, size)
+    except OSError as e:
+        os.close(fd)
+        if e.errno == errno.EINVAL:  # filesystem rejected direct I/O
+            return None
+        raise
+    except BaseException:
+        os.close(fd)
+        raise
+    finally:
+        view.release()
+        buf.close()
+
+    return os.fdopen(fd, "wb")
+
+
+# Most buffers a single writev call accepts
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+
+# Buffer for objects.bin where writev is unavailable, so small chunks
+# are coalesced into a few large writes (the default is only 8 KiB)
+_WRITE_BUFFER = 4 << 20
+_BLOB_BUFFERING = -1 if hasattr(os, "writev") else _WRITE_BUFFER
+
+
+def _write_chunks(f, chunks):
+    """
+    Write chunks to the freshly opened file f.
+    Chunks are handed to the kernel in writev batches of up to IOV_MAX
+    buffers instead of one write call each; short writes are resumed.
+    """
+    if not hasattr(os, "writev"):  # Windows
+        for chunk in chunks:
+            f.write(chunk)
+        return
+
+    f.flush()
+    fd = f.fileno()
+    pending = [memoryview(chunk) for chunk in chunks if len(chunk)]
+    i = 0
+    while i < len(pending):
+        n = os.writev(fd, pending[i : i + _IOV_MAX])
+        # Skip what was written; a partly written chunk is resliced
+        while n and n >= len(pending[i]):
+            n -= len(pending[i])
+            i += 1
+        if n:
+            pending[i] = pending[i][n:]
+
+
+def _fsync_dir(dirpath):
+    """Best-effort fsync of a directory (not supported everywhere)."""
+    try:
+        dir_fd = os.open(dirpath, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def _sync_all(files):
+    """Flush and fsync several files concurrently."""
+    sync = getattr(os, "fdatasync", os.fsync)
+
+    def _sync(f):
+        f.flush()
+        sync(f.fileno())
+
+    with ThreadPoolExecutor(max_workers=len(files)) as pool:
+        list(pool.map(_sync, files))
 
 
 def save_checkpoint(
@@ -73,159 +366,244 @@ def save_checkpoint(
     path: str,
     name: str | None = None,
     include: list | None = None,
+    precision: str | None = None,
+    exclude: list | None = None,
+    compression: str | None = None,
 ) -> str:
+    """
+    Save the selected variables of namespace as a checkpoint under path.
+    Without include, private ("_"-prefixed) names, callables and modules
+    are skipped, so locals() can be passed as is; exclude drops further
+    names in either case.
+    precision ("bf16" or "int8") opts in to lossy storage of float32
+    arrays; restore converts them back to float32.
+    compression ("lz4") opts in to compressing large arrays; restoring
+    them then needs lz4 installed as well.
+    Returns the checkpoint ID.
+    """
+    if precision not in _PRECISIONS:
+        raise ValueError(f"Unsupported precision: {precision!r}")
+    if compression not in _COMPRESSIONS:
+        raise ValueError(f"Unsupported compression: {compression!r}")
+    if compression == "lz4" and lz4 is None:
+        raise ValueError("compression='lz4' requires the lz4 package")
+
     os.makedirs(path, exist_ok=True)
 
     # -----------------------------
     # Capture caller info (Day-4)
     # -----------------------------
-    frame = inspect.stack()[1]
+    # Only the direct caller's frame is needed; inspect.stack() would
+    # build (and read source context for) every frame on the stack.
+    frame = sys._getframe(1)
     caller_info = {
-        "file": frame.filename,
-        "function": frame.function,
-        "line": frame.lineno,
+        "file": frame.f_code.co_filename,
+        "function": frame.f_code.co_name,
+        "line": frame.f_lineno,
     }
-    env_info = {
-    "python_version": sys.version,
-    "pid": os.getpid(),
-}
-    
-    def _get_git_commit():
-        try:
-            out = subprocess.check_output(
-                ["git", "rev-parse", "--short", "HEAD"],
-                stderr=subprocess.DEVNULL,
-                timeout=1,
-            )
-            return out.decode().strip()
-        except Exception:
-            return None
-
+    del frame
+    # pid is looked up per call: a forked child must not report its parent's
+    env_info = dict(_ENV_INFO, pid=os.getpid())
 
     # -----------------------------
     # 1. Select variables
     # -----------------------------
+    # Filtered before serialization, so skipped values cost nothing
     if include is None:
-        items = dict(namespace)
+        items = {
+            k: v
+            for k, v in namespace.items()
+            if not (isinstance(k, str) and k.startswith("_"))
+            and not callable(v)
+            and not isinstance(v, types.ModuleType)
+        }
     else:
         items = {k: namespace[k] for k in include if k in namespace}
 
-    # -----------------------------
-    # 2. Validate safety
-    # -----------------------------
-    errors = []
-    for k, v in items.items():
-        if not _is_safe(v):
-            errors.append((k, type(v).__name__, repr(v)[:80]))
-
-    if errors:
-        raise UnserializableError(errors)
+    if exclude:
+        for k in exclude:
+            items.pop(k, None)
 
     # -----------------------------
-    # 3. Deterministic order
+    # 2. Deterministic order
     # -----------------------------
     ordered_keys = sorted(items.keys())
 
+    manifest = {
+        "variables": ordered_keys,
+        "schema": CURRENT_SCHEMA,
+    }
+
     # -----------------------------
-    # 4. Build objects.bin + idx
+    # 3. Build objects.bin + idx
     # -----------------------------
-    objects_blob = bytearray()
+    # Serializing doubles as the safety check: msgpack rejects anything
+    # outside its native types, so no separate validation walk is needed.
+    # The manifest is encoded once; these exact bytes are both hashed
+    # and written to manifest.json.
+    manifest_bytes = json.dumps(manifest, sort_keys=True).encode()
+
+    # Serialized objects are kept as separate chunks (array chunks are
+    # views, not copies) and written out once the total size is known.
+    chunks = []
     objects_idx = {}
 
+    # Arrays are serialized on a thread pool (copies, compression and
+    # digests of large buffers release the GIL) while this thread packs
+    # everything else inline and lays objects out in key order, so the
+    # ID stays deterministic. msgpack holds the GIL, so small values would
+    # gain nothing from the pool but per-task overhead.
+    # Identical payloads are stored once: they are matched by their digest
+    # (confirmed byte for byte) and share offset and length, while each
+    # entry keeps its own type and array fields.
+    errors = []
+    stored = {}
     offset = 0
-    for key in ordered_keys:
-        value = items[key]
-        data = _serialize(value)
-        length = len(data)
-        sha = hashlib.sha256(data).hexdigest()
-
-        objects_blob.extend(data)
-
-        objects_idx[key] = {
-            "offset": offset,
-            "length": length,
-            "sha256": sha,
-            "type": "numpy" if _is_numpy_array(value) else "msgpack",
+    array_keys = [key for key in ordered_keys if _is_numpy_array(items[key])]
+    workers = max(1, min(len(array_keys), os.cpu_count() or 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            key: pool.submit(
+                _serialize_with_digest, items[key], precision, compression
+            )
+            for key in array_keys
         }
 
-        offset += length
+        for key in ordered_keys:
+            value = items[key]
+            try:
+                if key in futures:
+                    data, extra, digest = futures[key].result()
+                else:
+                    data, extra, digest = _serialize_with_digest(
+                        value, precision, compression
+                    )
+            except (TypeError, ValueError, OverflowError) as e:
+                errors.append((key, type(value).__name__, str(e)[:80]))
+                continue
+
+            length = len(data)
+            seen = stored.get((digest, length))
+            if seen is not None and seen[1] == data:
+                data_offset = seen[0]
+            else:
+                data_offset = offset
+                stored[(digest, length)] = (offset, data)
+                chunks.append(data)
+                offset += length
+
+            objects_idx[key] = {
+                "offset": data_offset,
+                "length": length,
+                "type": "numpy" if _is_numpy_array(value) else "msgpack",
+                "hash": digest,
+                "algo": DIGEST_ALGO,
+                **extra,
+            }
 
-    # -----------------------------
-    # 5. Manifest & metadata
-    # -----------------------------
-    manifest = {
-        "variables": ordered_keys,
-        "schema": "v1",
-    }
-
-
-    # Get git commit hash (if available)
-    try:
-        git_commit = subprocess.check_output(
-            ["git", "rev-parse", "--short", "HEAD"],
-            stderr=subprocess.DEVNULL,
-            timeout=1,
-        ).decode().strip()
-    except Exception:
-        git_commit = None
+    if errors:
+        raise UnserializableError(errors)
 
+    blob_size = offset
 
+    # -----------------------------
+    # 4. Metadata
+    # -----------------------------
     metadata = {
         "execution_id": execution_id,
         "checkpoint_name": name,
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "caller": caller_info,
         "environment": env_info,
-        "git_commit": git_commit,
+        "git_commit": _current_git_commit(),
     }
 
     # -----------------------------
-    # 6. Compute checkpoint ID
+    # 5. Checkpoint ID
     # -----------------------------
-    h = hashlib.sha256()
-    h.update(json.dumps(manifest, sort_keys=True).encode())
-    h.update(objects_blob)
-    checkpoint_id = h.hexdigest()
-
-    final_dir = os.path.join(path, checkpoint_id)
-
-    if os.path.exists(final_dir):
-        return checkpoint_id
-
-    tmp_dir = tempfile.mkdtemp(prefix="_ckpt_", dir=path)
+    # A single rolling SHA-256 over manifest + blob + entry layouts is
+    # the checkpoint ID; the layouts (type, dtype, shape..., and the
+    # offset each variable points at) make equal bytes decoded or shared
+    # differently distinct checkpoints. It runs on its own
+    # thread (hashlib releases the GIL on large buffers) while the same
+    # chunks are written to staging below.
+    layout = layout_bytes([objects_idx[key] for key in ordered_keys])
+
+    def _checkpoint_id():
+        h = hashlib.sha256(manifest_bytes)
+        for chunk in chunks:
+            h.update(chunk)
+        h.update(layout)
+        return h.hexdigest()
+
+    # Staged inside path itself, so promotion below is always a
+    # same-filesystem rename: no data is copied, whatever the backend.
+    # The whole directory is promoted by one rename; files are never
+    # renamed one by one.
+    tmp_dir = tempfile.mkdtemp(prefix=".staging-", dir=path)
 
     try:
         # -----------------------------
-        # 7. Write files (atomic)
+        # 6. Write files (atomic)
         # -----------------------------
-        def _write_json(fname, obj):
-            with open(fname, "w") as f:
-                json.dump(obj, f, sort_keys=True)
-                f.flush()
-                os.fsync(f.fileno())
-
-        _write_json(os.path.join(tmp_dir, "manifest.json"), manifest)
-        _write_json(os.path.join(tmp_dir, "metadata.json"), metadata)
-        _write_json(os.path.join(tmp_dir, "objects.idx"), objects_idx)
-
-        with open(os.path.join(tmp_dir, "objects.bin"), "wb") as f:
-            f.write(objects_blob)
-            f.flush()
-            os.fsync(f.fileno())
-
-        with open(os.path.join(tmp_dir, "checksum.sha256"), "w") as f:
-            f.write(checkpoint_id)
-            f.flush()
-            os.fsync(f.fileno())
-
-        try:
-            dir_fd = os.open(tmp_dir, os.O_RDONLY)
-            os.fsync(dir_fd)
-            os.close(dir_fd)
-        except Exception:
-            pass
-
+        # All files are written first and synced together afterwards, so
+        # their flush latencies overlap instead of adding up.
+        with contextlib.ExitStack() as stack:
+            hasher = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+            id_future = hasher.submit(_checkpoint_id)
+
+            def _create(fname, buffering=-1):
+                return stack.enter_context(
+                    open(os.path.join(tmp_dir, fname), "wb", buffering=buffering)
+                )
+
+            def _write_bytes(fname, data):
+                f = _create(fname)
+                f.write(data)
+                return f
+
+            def _write_json(fname, obj):
+                return _write_bytes(fname, json.dumps(obj, sort_keys=True).encode())
+
+            files = [
+                _write_bytes("manifest.json", manifest_bytes),
+                _write_json("metadata.json", metadata),
+                _write_bytes("objects.idx", encode_index(objects_idx)),
+            ]
+
+            f = None
+            if blob_size >= _DIRECT_IO_MIN_SIZE:
+                f = _write_direct(
+                    os.path.join(tmp_dir, "objects.bin"), chunks, blob_size
+                )
+            if f is not None:
+                stack.enter_context(f)
+            else:
+                f = _create("objects.bin", _BLOB_BUFFERING)
+                _preallocate(f.fileno(), blob_size)
+                _write_chunks(f, chunks)
+            files.append(f)
+
+            checkpoint_id = id_future.result()
+            final_dir = os.path.join(path, checkpoint_id)
+
+            # Identical checkpoint already saved: the staged copy is dropped
+            exists = os.path.exists(final_dir)
+            if not exists:
+                f = _create("checksum.sha256")
+                f.write(checkpoint_id.encode())
+                files.append(f)
+
+                _sync_all(files)
+
+        if exists:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return checkpoint_id
+
+        _fsync_dir(tmp_dir)
         os.replace(tmp_dir, final_dir)
+        # Persist the rename itself
+        _fsync_dir(path)
 
     except Exception as e:
         shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -1,13 +1,18 @@
 # pystele/core/clock.py
 from __future__ import annotations
 
-from datetime import datetime, timezone
 import threading
+import time
 
 
 def logical_now() -> str:
     """Return UTC ISO8601 timestamp with millisecond precision."""
-    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    secs, ns = divmod(time.time_ns(), 1_000_000_000)
+    t = time.gmtime(secs)
+    return (
+        f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
+        f"T{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}.{ns // 1_000_000:03d}Z"
+    )
 
 
 class LogicalClock:
@@ -17,8 +22,10 @@ class LogicalClock:
         self._last = ""
 
     def tick(self) -> str:
+        # Formatted outside the lock; the fixed-width format compares
+        # correctly as a string.
+        now = logical_now()
         with self._lock:
-            now = logical_now()
             if now <= self._last:
                 now = self._last
             self._last = now
@@ -5,16 +5,49 @@ import hashlib
 import json
 from typing import Any
 
+# Optional NumPy support
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 def sha256_hex(data: bytes) -> str:
     """Return SHA-256 hex digest of bytes."""
     return hashlib.sha256(data).hexdigest()
 
 
+def _digest64(data: bytes) -> str:
+    """64-bit BLAKE2b hex digest, the same in every environment."""
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _array_bytes(arr: Any) -> memoryview:
+    """C-order bytes of arr; a view of its buffer if already C-contiguous."""
+    if not arr.flags.c_contiguous:
+        arr = np.ascontiguousarray(arr)
+    # Viewed as uint8 (not memoryview.cast) so every dtype is accepted
+    return memoryview(arr.reshape(-1).view(np.uint8))
+
+
+def _default(obj: Any) -> Any:
+    # Arrays hash by dtype, shape and raw bytes, not by repr
+    if np is not None and isinstance(obj, np.ndarray):
+        return {
+            "__ndarray__": [
+                np.lib.format.dtype_to_descr(obj.dtype),
+                list(obj.shape),
+                _digest64(_array_bytes(obj)),
+            ]
+        }
+    raise TypeError(f"Object of type {type(obj).__name__} is not hashable content")
+
+
 def content_hash(obj: Any) -> str:
     """
     Deterministically hash supported Python primitives.
-    Supported: dict, list, str, int, float, bool, None.
+    Supported: dict, list, str, int, float, bool, None, numpy arrays.
+    Returns 16 hex chars (BLAKE2b-64), stable across machines.
     """
     serialized = json.dumps(
         obj,
@@ -22,8 +55,9 @@ def content_hash(obj: Any) -> str:
         separators=(",", ":"),
         ensure_ascii=False,
         allow_nan=False,
+        default=_default,
     ).encode("utf-8")
-    return sha256_hex(serialized)
+    return _digest64(serialized)
 
 
 if __name__ == "__main__":
@@ -1,18 +1,35 @@
 # pystele/core/ids.py
 from __future__ import annotations
 
-import secrets
-from datetime import datetime, timezone
+import binascii
+import os
+import time
+
+# Pre-bound: ID creation sits in hot loops
+_urandom = os.urandom
+_hexlify = binascii.hexlify
+_gmtime = time.gmtime
+_strftime = time.strftime
 
 
 def _timestamp() -> str:
     """UTC timestamp in YYYYMMDDThhmmss format."""
-    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return _strftime("%Y%m%dT%H%M%S", _gmtime())
+
+
+def new_ids(prefix: str, n: int) -> list[str]:
+    """
+    Create n unique identifiers sharing one timestamp.
+    Format: <prefix>-YYYYMMDDThhmmss-<8hex>
+    The random suffixes come from a single os.urandom call.
+    """
+    ts = _timestamp()
+    hexed = _hexlify(_urandom(4 * n)).decode()
+    return [f"{prefix}-{ts}-{hexed[i:i + 8]}" for i in range(0, 8 * n, 8)]
 
 
-def _random_hex() -> str:
-    """8 hex chars of cryptographically strong randomness."""
-    return secrets.token_hex(4)
+def _new_id(prefix: str) -> str:
+    return f"{prefix}-{_timestamp()}-{_hexlify(_urandom(4)).decode()}"
 
 
 def new_execution_id() -> str:
@@ -20,7 +37,7 @@ def new_execution_id() -> str:
     Create a unique execution identifier.
     Format: execution-YYYYMMDDThhmmss-<8hex>
     """
-    return f"execution-{_timestamp()}-{_random_hex()}"
+    return _new_id("execution")
 
 
 def new_run_id() -> str:
@@ -28,7 +45,7 @@ def new_run_id() -> str:
     Create a unique run identifier.
     Format: run-YYYYMMDDThhmmss-<8hex>
     """
-    return f"run-{_timestamp()}-{_random_hex()}"
+    return _new_id("run")
 
 
 def new_branch_id() -> str:
@@ -36,7 +53,7 @@ def new_branch_id() -> str:
     Create a unique branch identifier.
     Format: branch-YYYYMMDDThhmmss-<8hex>
     """
-    return f"branch-{_timestamp()}-{_random_hex()}"
+    return _new_id("branch")
 
 
 if __name__ == "__main__":
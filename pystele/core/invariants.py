@@ -13,26 +13,26 @@ CORE_INVARIANTS = [
 ]
 
 
-def check_invariants(state: Dict) -> List[str]:
-    """Return list of violated invariants (empty = pass)."""
-    violated: List[str] = []
-
-    if not isinstance(state.get("commit_log"), list):
-        violated.append("commit-log-append-only")
-
-    if state.get("ids_mutable") is True:
-        violated.append("ids-immutable")
+# (state key, invariant, check on the value), in CORE_INVARIANTS order
+_CHECKS = (
+    ("commit_log", "commit-log-append-only", lambda v: isinstance(v, list)),
+    ("ids_mutable", "ids-immutable", lambda v: v is not True),
+    ("snapshots_consistent", "snapshot-consistency", lambda v: v is True),
+    ("clock_monotonic", "clock-monotonic", lambda v: v is True),
+    ("version", "config-version-set", lambda v: isinstance(v, str) and bool(v)),
+    ("storage_path", "storage-path-set", bool),
+)
 
-    if state.get("snapshots_consistent") is not True:
-        violated.append("snapshot-consistency")
+# Keys whose absence alone violates their invariant (ids_mutable may be unset)
+_REQUIRED = frozenset(key for key, _, _ in _CHECKS if key != "ids_mutable")
 
-    if state.get("clock_monotonic") is not True:
-        violated.append("clock-monotonic")
 
-    if not isinstance(state.get("version"), str) or not state.get("version"):
-        violated.append("config-version-set")
-
-    if not state.get("storage_path"):
-        violated.append("storage-path-set")
-
-    return violated
+def check_invariants(state: Dict) -> List[str]:
+    """Return list of violated invariants (empty = pass)."""
+    # Missing keys fail without running their check
+    missing = _REQUIRED - state.keys()
+    return [
+        name
+        for key, name, ok in _CHECKS
+        if key in missing or not ok(state.get(key))
+    ]
@@ -13,25 +13,37 @@ import sys
 import time
 import json
 import uuid
+import weakref
 import pickle
 import signal
+import threading
+import msgpack
 import logging
 import traceback
 import multiprocessing as mp
 from datetime import datetime
-from filelock import FileLock
 import psutil
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    from filelock import FileLock
+
 BASE_DIR = os.path.abspath(".pystele")
 IS_POSIX = os.name == "posix"
 
+# O_APPEND makes each os.write() of a record an atomic append
+AUDIT_FLAGS = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+AUDIT_FD_CACHE = 64
+
 
 # ------------------------
 # Utilities
 # ------------------------
 
-def _now() -> float:
-    return time.time()
+# Monotonic, integer nanoseconds: immune to wall-clock jumps
+_mono = time.monotonic_ns
 
 
 def _ts() -> str:
@@ -49,13 +61,39 @@ def _atomic_write(path: str, data: bytes) -> None:
 
 def checkpoint_state(obj: Any, path: str) -> Optional[str]:
     try:
-        data = pickle.dumps(obj)
+        data = msgpack.packb(obj, use_bin_type=True)
         _atomic_write(path, data)
         return None
     except Exception as e:
         return f"Checkpoint failed: {e}"
 
 
+def load_state(path: str) -> Any:
+    with open(path, "rb") as f:
+        data = f.read()
+    # Older checkpoints are pickles: protocol 2+ starts with PROTO (0x80)
+    # and a version byte, while a msgpack 0x80 (empty map) stands alone.
+    if len(data) > 1 and data[0] == 0x80:
+        return pickle.loads(data)
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def _close_fds(fds: Dict[str, int]) -> None:
+    while fds:
+        _, fd = fds.popitem()
+        os.close(fd)
+
+
+def _running_pids() -> Optional[set]:
+    """PIDs currently in /proc, or None where /proc is unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return {int(name) for name in os.listdir("/proc") if name.isdigit()}
+    except OSError:
+        return None
+
+
 # ------------------------
 # Child process
 # ------------------------
@@ -76,6 +114,8 @@ def _child_entry(
     sys.stdout = open(stdout_path, "a", buffering=1)
     sys.stderr = open(stderr_path, "a", buffering=1)
 
+    audit_fd = os.open(audit_path, AUDIT_FLAGS, 0o644)
+
     def audit(event: str, meta: Optional[Dict] = None):
         rec = {
             "ts": _ts(),
@@ -83,32 +123,33 @@ def _child_entry(
             "pid": os.getpid(),
             "meta": meta or {},
         }
-        with open(audit_path, "a") as f:
-            f.write(json.dumps(rec) + "\n")
-            f.flush()
+        os.write(audit_fd, (json.dumps(rec) + "\n").encode())
 
     context = {}
     if os.path.exists(checkpoint_path):
         try:
-            with open(checkpoint_path, "rb") as f:
-                context = pickle.load(f)
+            context = load_state(checkpoint_path)
             audit("CHECKPOINT_LOADED")
         except Exception as e:
             audit("ERROR", {"error": str(e)})
 
-    last_ckpt = _now()
+    interval_ns = (
+        None if checkpoint_interval_s is None
+        else int(checkpoint_interval_s * 1_000_000_000)
+    )
+    last_ckpt = _mono()
 
     def maybe_checkpoint():
         nonlocal last_ckpt
-        if checkpoint_interval_s is None:
+        if interval_ns is None:
             return
-        if _now() - last_ckpt >= checkpoint_interval_s:
+        if _mono() - last_ckpt >= interval_ns:
             err = checkpoint_state(context, checkpoint_path)
             if err:
                 audit("ERROR", {"error": err})
             else:
                 audit("CHECKPOINT")
-            last_ckpt = _now()
+            last_ckpt = _mono()
 
     try:
         audit("START")
@@ -119,6 +160,7 @@ def _child_entry(
         audit("ERROR", {"traceback": traceback.format_exc()})
         raise
     finally:
+        os.close(audit_fd)
         sys.stdout.flush()
         sys.stderr.flush()
 
@@ -132,6 +174,18 @@ class ExecEngine:
         self.base_dir = base_dir
         os.makedirs(self.base_dir, exist_ok=True)
         logging.basicConfig(level=logging.INFO)
+        self._audit_fds: Dict[str, int] = {}
+        # Guards the fd cache: a cached fd must not be closed (and its
+        # number reused) while another thread is writing to it
+        self._audit_lock = threading.Lock()
+        # Closes the fds when the engine is collected or at exit, without
+        # keeping the engine itself alive
+        weakref.finalize(self, _close_fds, self._audit_fds)
+
+    def close(self) -> None:
+        """Close cached audit log descriptors."""
+        with self._audit_lock:
+            _close_fds(self._audit_fds)
 
     # ---- helpers ----
 
@@ -157,14 +211,37 @@ class ExecEngine:
             "pid": self._read_pid(exec_id),
             "meta": meta or {},
         }
-        with open(self._audit_path(exec_id), "a") as f:
-            f.write(json.dumps(rec) + "\n")
-            f.flush()
+        data = (json.dumps(rec) + "\n").encode()
+        with self._audit_lock:
+            os.write(self._audit_fd(exec_id), data)
+
+    def _audit_fd(self, exec_id: str) -> int:
+        # Caller holds _audit_lock
+        fd = self._audit_fds.get(exec_id)
+        if fd is None:
+            if len(self._audit_fds) >= AUDIT_FD_CACHE:
+                oldest = next(iter(self._audit_fds))
+                os.close(self._audit_fds.pop(oldest))
+            fd = os.open(self._audit_path(exec_id), AUDIT_FLAGS, 0o644)
+            self._audit_fds[exec_id] = fd
+        return fd
 
     def _write_meta(self, exec_id: str, meta: Dict):
         path = self._meta_path(exec_id)
-        with FileLock(path + ".lock"):
-            _atomic_write(path, json.dumps(meta, indent=2).encode())
+        data = json.dumps(meta, indent=2).encode()
+
+        if fcntl is None:
+            with FileLock(path + ".lock"):
+                _atomic_write(path, data)
+            return
+
+        # flock is a single syscall and is released when the fd closes
+        fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            _atomic_write(path, data)
+        finally:
+            os.close(fd)
 
     def _read_meta(self, exec_id: str) -> Dict:
         try:
@@ -211,7 +288,11 @@ class ExecEngine:
             args=(exec_id, func, args, kwargs, work_dir, checkpoint_interval_s),
             daemon=False,
         )
-        p.start()
+        # Forked children would otherwise inherit every cached fd; the lock
+        # keeps other threads from reopening one before the fork
+        with self._audit_lock:
+            _close_fds(self._audit_fds)
+            p.start()
 
         self._write_pid(exec_id, p.pid)
         self._write_audit(exec_id, "START")
@@ -252,28 +333,46 @@ class ExecEngine:
                 pass
         self._write_audit(exec_id, "KILL")
 
-    def status(self, exec_id: str) -> Dict:
-        pid = self._read_pid(exec_id)
-        state = "STOPPED"
+    def _state(self, pid: Optional[int], alive: Optional[bool] = None) -> str:
+        if not pid:
+            return "STOPPED"
+        if alive is None:
+            alive = psutil.pid_exists(pid)
+        if not alive:
+            return "STOPPED"
 
-        if pid and psutil.pid_exists(pid):
-            p = psutil.Process(pid)
-            if p.status() == psutil.STATUS_STOPPED:
-                state = "PAUSED"
-            else:
-                state = "RUNNING"
+        try:
+            if psutil.Process(pid).status() == psutil.STATUS_STOPPED:
+                return "PAUSED"
+        except psutil.NoSuchProcess:
+            return "STOPPED"
+        return "RUNNING"
 
+    def status(self, exec_id: str) -> Dict:
+        pid = self._read_pid(exec_id)
         return {
             "exec_id": exec_id,
-            "state": state,
+            "state": self._state(pid),
             "pid": pid,
         }
 
     def list(self) -> Dict[str, Dict]:
-        return {
-            eid: self.status(eid)
-            for eid in os.listdir(self.base_dir)
-        }
+        # One /proc listing answers liveness for every execution at once;
+        # only live pids need a per-process status lookup.
+        running = _running_pids()
+        jobs = {}
+        with os.scandir(self.base_dir) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+                pid = self._read_pid(entry.name)
+                alive = None if running is None else pid in running
+                jobs[entry.name] = {
+                    "exec_id": entry.name,
+                    "state": self._state(pid, alive),
+                    "pid": pid,
+                }
+        return jobs
 
 
 if __name__ == "__main__":
@@ -1,8 +1,14 @@
 import time
 import os
 import json
+import pickle
+import gc
+import weakref
+import threading
+import subprocess
 import psutil
-from pystele.engine.exec import ExecEngine
+from pystele.engine import exec as exec_mod
+from pystele.engine.exec import ExecEngine, checkpoint_state, load_state
 import pytest
 
 
@@ -65,4 +71,100 @@ def test_audit_log_events():
     assert "START" in events
     assert ("PAUSE" in events) or ("PAUSE_SKIPPED" in events)
     assert ("RESUME" in events) or ("RESUME_SKIPPED" in events)
-    assert "KILL" in events
\ No newline at end of file
+    assert "KILL" in events
+
+def test_load_state_legacy_pickle(tmp_path):
+    path = tmp_path / "checkpoint.pkl"
+    state = {"i": 42, "items": (1, 2)}
+    path.write_bytes(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+    assert load_state(str(path)) == state
+
+    path.write_bytes(pickle.dumps(state, protocol=2))
+    assert load_state(str(path)) == state
+
+
+def test_load_state_empty_msgpack_map(tmp_path):
+    path = tmp_path / "checkpoint.pkl"
+    path.write_bytes(b"\x80")
+    assert load_state(str(path)) == {}
+
+    assert checkpoint_state({}, str(path)) is None
+    assert load_state(str(path)) == {}
+
+
+def test_load_state_msgpack_context(tmp_path):
+    path = tmp_path / "checkpoint.pkl"
+    context = {"i": 1500, "name": "run", "vals": [1.5, None, True], 3: "int key"}
+    assert checkpoint_state(context, str(path)) is None
+    assert load_state(str(path)) == context
+
+
+def test_engine_is_collectable_and_closes_audit_fds(tmp_path):
+    engine = ExecEngine(base_dir=str(tmp_path))
+    os.makedirs(engine._exec_dir("job"))
+    engine._write_audit("job", "TEST")
+    fd = engine._audit_fds["job"]
+
+    ref = weakref.ref(engine)
+    del engine
+    gc.collect()
+
+    assert ref() is None
+    with pytest.raises(OSError):
+        os.fstat(fd)
+
+
+def test_concurrent_audit_writes_stay_in_their_log(tmp_path, monkeypatch):
+    # A tiny cache forces constant eviction while threads write
+    monkeypatch.setattr(exec_mod, "AUDIT_FD_CACHE", 2)
+    engine = ExecEngine(base_dir=str(tmp_path))
+    ids = [f"job{i}" for i in range(6)]
+    for exec_id in ids:
+        os.makedirs(engine._exec_dir(exec_id))
+
+    def writer(exec_id):
+        for _ in range(200):
+            engine._write_audit(exec_id, "TICK", {"id": exec_id})
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.close()
+
+    for exec_id in ids:
+        with open(engine._audit_path(exec_id)) as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == 200
+        assert all(r["meta"]["id"] == exec_id for r in records)
+
+
+def test_list_states(tmp_path, monkeypatch):
+    engine = ExecEngine(base_dir=str(tmp_path))
+
+    # A pid that has exited (and been reaped)
+    proc = subprocess.Popen(["true"] if os.name == "posix" else ["cmd", "/c", "exit"])
+    proc.wait()
+    os.makedirs(engine._exec_dir("dead"))
+    engine._write_pid("dead", proc.pid)
+
+    # A live pid: this test process
+    os.makedirs(engine._exec_dir("live"))
+    engine._write_pid("live", os.getpid())
+
+    os.makedirs(engine._exec_dir("nopid"))
+    (tmp_path / "stray.txt").write_text("not an execution")
+
+    jobs = engine.list()
+    assert set(jobs) == {"dead", "live", "nopid"}
+    assert jobs["dead"]["state"] == "STOPPED"
+    assert jobs["live"]["state"] == "RUNNING"
+    assert jobs["nopid"] == {"exec_id": "nopid", "state": "STOPPED", "pid": None}
+
+    # Process exits between the liveness check and the status lookup
+    def vanished(pid):
+        raise psutil.NoSuchProcess(pid)
+
+    monkeypatch.setattr(psutil, "Process", vanished)
+    assert engine._state(os.getpid(), alive=True) == "STOPPED"
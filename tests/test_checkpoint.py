@@ -7,9 +7,11 @@ import pytest
 
 from checkpoint.save import save_checkpoint
 from checkpoint.restore import restore_checkpoint
+from checkpoint.index import read_index, write_index, layout_bytes
 from checkpoint.exceptions import (
     UnserializableError,
     ChecksumMismatchError,
+    CorruptCheckpointError,
     AtomicWriteError,
 )
 
@@ -33,6 +35,24 @@ def test_day2_save_restore_basic():
         assert ns["y"] == {"a": [1, 2, 3]}
 
 
+def test_default_selection_skips_private_callables_and_modules():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        namespace = {
+            "x": 1,
+            "_hidden": 2,
+            "fn": lambda: None,
+            "cls": dict,
+            "mod": os,
+            "drop": 3,
+        }
+        ckpt_id = save_checkpoint("exp", namespace, tmpdir, exclude=["drop"])
+
+        ns = {}
+        restored = restore_checkpoint(os.path.join(tmpdir, ckpt_id), ns)
+        assert restored == ["x"]
+        assert ns == {"x": 1}
+
+
 # -------------------------
 # Test 2: deterministic ID
 # -------------------------
@@ -44,6 +64,8 @@ def test_checkpoint_determinism():
         id2 = save_checkpoint("exp", data, tmpdir)
 
         assert id1 == id2
+        # The repeated save leaves no staging directory behind
+        assert os.listdir(tmpdir) == [id1]
 
 
 # -------------------------
@@ -57,8 +79,7 @@ def test_per_object_checksum_failure():
         ckpt_path = os.path.join(tmpdir, ckpt_id)
 
         # Load objects.idx to find offset of "y"
-        with open(os.path.join(ckpt_path, "objects.idx")) as f:
-            idx = json.load(f)
+        idx = read_index(os.path.join(ckpt_path, "objects.idx"))
 
         entry = idx["y"]
         offset = entry["offset"]
@@ -73,8 +94,64 @@ def test_per_object_checksum_failure():
             restore_checkpoint(ckpt_path, {})
 
 
+def test_per_object_index_tamper():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ckpt_id = save_checkpoint("exp", {"x": 123, "y": 456}, tmpdir)
+        ckpt_path = os.path.join(tmpdir, ckpt_id)
+
+        idx_path = os.path.join(ckpt_path, "objects.idx")
+        original = dict(read_index(idx_path))
+
+        # Point "x" at the bytes of "y": offsets are covered by the ID
+        idx = {k: dict(v) for k, v in original.items()}
+        idx["x"]["offset"] = idx["y"]["offset"]
+        write_index(idx_path, idx)
+        with pytest.raises(ChecksumMismatchError):
+            restore_checkpoint(ckpt_path, {})
+
+        # A wrong per-object digest is caught by the per-object check
+        idx = {k: dict(v) for k, v in original.items()}
+        idx["x"]["hash"] = idx["y"]["hash"]
+        write_index(idx_path, idx)
+        with pytest.raises(ChecksumMismatchError, match="'x'"):
+            restore_checkpoint(ckpt_path, {})
+
+
+def test_shared_objects_are_part_of_the_id():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Same unique chunks, but "b" points at a different one
+        id1 = save_checkpoint("exp", {"a": 1, "b": 1, "c": 2}, tmpdir)
+        id2 = save_checkpoint("exp", {"a": 1, "b": 2, "c": 2}, tmpdir)
+        assert id1 != id2
+
+        ns = {}
+        restore_checkpoint(os.path.join(tmpdir, id2), ns)
+        assert ns == {"a": 1, "b": 2, "c": 2}
+
+
+# -------------------------
+# Test 4: duplicate objects stored once
+# -------------------------
+def test_duplicate_objects_share_storage():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cfg = {"lr": 0.1, "layers": [4, 4]}
+        data = {"a": cfg, "b": dict(cfg), "c": [1, 2]}
+        ckpt_id = save_checkpoint("exp", data, tmpdir)
+
+        ckpt_path = os.path.join(tmpdir, ckpt_id)
+        idx = read_index(os.path.join(ckpt_path, "objects.idx"))
+
+        assert idx["a"]["offset"] == idx["b"]["offset"]
+        assert idx["c"]["offset"] != idx["a"]["offset"]
+
+        ns = {}
+        restore_checkpoint(ckpt_path, ns)
+        assert ns["a"] == ns["b"] == cfg
+        assert ns["a"] is not ns["b"]
+
+
 # -------------------------
-# Test 4: atomicity on failure
+# Test 5: atomicity on failure
 # -------------------------
 def test_atomic_write_failure(monkeypatch):
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -122,12 +199,250 @@ def test_numpy_array_save_restore():
         assert ns["a"].dtype == np.float32
 
 
+def test_numpy_restore_mmap_mode():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = np.arange(12, dtype=np.int32).reshape(3, 4)
+        ckpt_id = save_checkpoint("exp-mm", {"a": a, "x": 1}, tmpdir)
+        ckpt_path = os.path.join(tmpdir, ckpt_id)
+
+        ns = {}
+        restore_checkpoint(ckpt_path, ns, mmap_mode="r")
+        assert np.array_equal(ns["a"], a)
+        assert not ns["a"].flags.writeable
+        assert ns["x"] == 1
+
+        ns = {}
+        restore_checkpoint(ckpt_path, ns, mmap_mode="c")
+        ns["a"][0, 0] = 99
+        del ns
+
+        # Copy-on-write changes never reach the checkpoint
+        ns = {}
+        restore_checkpoint(ckpt_path, ns)
+        assert np.array_equal(ns["a"], a)
+
+
+def _save_and_restore(tmpdir, data, **kwargs):
+    ckpt_id = save_checkpoint("exp-np", data, tmpdir, **kwargs)
+    ns = {}
+    restore_checkpoint(os.path.join(tmpdir, ckpt_id), ns)
+    return ckpt_id, ns
+
+
+def test_equal_bytes_different_layout_get_distinct_ids():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Same raw bytes, different shape
+        id1, ns1 = _save_and_restore(tmpdir, {"a": np.zeros((2, 3), "f4")})
+        id2, ns2 = _save_and_restore(tmpdir, {"a": np.zeros((3, 2), "f4")})
+        assert id1 != id2
+        assert ns1["a"].shape == (2, 3)
+        assert ns2["a"].shape == (3, 2)
+
+        # Same raw bytes, different dtype
+        ints = np.arange(6, dtype=np.int32)
+        id3, ns3 = _save_and_restore(tmpdir, {"a": ints})
+        id4, ns4 = _save_and_restore(tmpdir, {"a": ints.view(np.float32)})
+        assert id3 != id4
+        assert ns3["a"].dtype == np.int32
+        assert ns4["a"].dtype == np.float32
+
+
+def test_fortran_order_round_trip():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        f = np.asfortranarray(np.arange(12, dtype=np.int64).reshape(3, 4))
+        _, ns = _save_and_restore(tmpdir, {"f": f})
+        assert np.array_equal(ns["f"], f)
+        assert ns["f"].flags.f_contiguous
+
+        # Same bytes in memory as f, but a different C-ordered array
+        c = np.array([[1, 3], [2, 4]])
+        id1, ns1 = _save_and_restore(tmpdir, {"a": np.asfortranarray([[1, 2], [3, 4]])})
+        id2, ns2 = _save_and_restore(tmpdir, {"a": c})
+        assert id1 != id2
+        assert ns1["a"].tolist() == [[1, 2], [3, 4]]
+        assert ns2["a"].tolist() == [[1, 3], [2, 4]]
+
+
+def test_quantized_and_raw_arrays_get_distinct_ids():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = np.linspace(-1, 1, 8, dtype=np.float32)
+        bits = (a.view(np.uint32) >> 16).astype("<u2")
+
+        id1, ns1 = _save_and_restore(tmpdir, {"a": a}, precision="bf16")
+        id2, ns2 = _save_and_restore(tmpdir, {"a": bits})
+        assert id1 != id2
+        assert ns1["a"].dtype == np.float32
+        assert ns2["a"].dtype == np.uint16
+        assert np.array_equal(ns2["a"], bits)
+
+
+def test_index_layout_tamper_detected():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ckpt_id = save_checkpoint("exp-np", {"a": np.zeros((2, 3), "f4")}, tmpdir)
+        ckpt_path = os.path.join(tmpdir, ckpt_id)
+        idx_path = os.path.join(ckpt_path, "objects.idx")
+        original = dict(read_index(idx_path))
+
+        for field, bad in (("shape", [3, 2]), ("dtype", "<i4")):
+            idx = {k: dict(v) for k, v in original.items()}
+            idx["a"][field] = bad
+            write_index(idx_path, idx)
+            with pytest.raises(ChecksumMismatchError):
+                restore_checkpoint(ckpt_path, {})
+
+
+def test_malformed_array_entry_is_corrupt():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ckpt_id = save_checkpoint("exp-np", {"a": np.zeros((2, 3), "f4")}, tmpdir)
+        ckpt_path = os.path.join(tmpdir, ckpt_id)
+        idx_path = os.path.join(ckpt_path, "objects.idx")
+
+        # A shape that does not fit the bytes, with a matching checksum
+        idx = dict(read_index(idx_path))
+        idx["a"]["shape"] = [7]
+        write_index(idx_path, idx)
+
+        with open(os.path.join(ckpt_path, "manifest.json"), "rb") as f:
+            h = hashlib.sha256(f.read())
+        with open(os.path.join(ckpt_path, "objects.bin"), "rb") as f:
+            h.update(f.read())
+        h.update(layout_bytes([idx["a"]]))
+        with open(os.path.join(ckpt_path, "checksum.sha256"), "w") as f:
+            f.write(h.hexdigest())
+
+        with pytest.raises(CorruptCheckpointError, match="'a'"):
+            restore_checkpoint(ckpt_path, {})
+
+
+def test_equal_arrays_share_storage():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = np.zeros((4, 6), dtype=np.float32)
+        data = {"a": a, "b": a.copy(), "c": a.reshape(6, 4).copy()}
+        ckpt_id = save_checkpoint("exp-np", data, tmpdir)
+
+        ckpt_path = os.path.join(tmpdir, ckpt_id)
+        idx = read_index(os.path.join(ckpt_path, "objects.idx"))
+        assert idx["a"]["offset"] == idx["b"]["offset"] == idx["c"]["offset"]
+        assert os.path.getsize(os.path.join(ckpt_path, "objects.bin")) == a.nbytes
+
+        ns = {}
+        restore_checkpoint(ckpt_path, ns)
+        assert ns["c"].shape == (6, 4)
+        assert np.array_equal(ns["b"], a)
+
+
+def test_shared_arrays_id_and_copy_on_write():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        z, o = np.zeros(4), np.ones(4)
+        id1 = save_checkpoint("exp-np", {"a": z, "b": z.copy(), "c": o}, tmpdir)
+        id2 = save_checkpoint("exp-np", {"a": z, "b": o.copy(), "c": o}, tmpdir)
+        assert id1 != id2
+
+        ns = {}
+        restore_checkpoint(os.path.join(tmpdir, id1), ns, mmap_mode="c")
+        assert not np.shares_memory(ns["a"], ns["b"])
+        ns["a"][0] = 42
+        assert ns["b"][0] == 0
+
+
+def test_large_numpy_array_compressed():
+    if np is None:
+        pytest.skip("NumPy not installed")
+    pytest.importorskip("lz4")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = np.zeros((512, 512), dtype=np.float32)
+        ckpt_id = save_checkpoint("exp-lz4", {"a": a}, tmpdir, compression="lz4")
+
+        idx = read_index(os.path.join(tmpdir, ckpt_id, "objects.idx"))
+        assert idx["a"]["codec"] == "lz4"
+        assert idx["a"]["length"] < a.nbytes
+
+        ns = {}
+        restore_checkpoint(os.path.join(tmpdir, ckpt_id), ns)
+        assert np.array_equal(ns["a"], a)
+        assert ns["a"].dtype == np.float32
+
+        # Same data uncompressed is a different checkpoint
+        assert save_checkpoint("exp-lz4", {"a": a}, tmpdir) != ckpt_id
+
+
+def test_compression_is_opt_in(monkeypatch):
+    if np is None:
+        pytest.skip("NumPy not installed")
+    import checkpoint.save as save_mod
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = np.zeros((512, 512), dtype=np.float32)
+        ckpt_id = save_checkpoint("exp-lz4", {"a": a}, tmpdir)
+        idx = read_index(os.path.join(tmpdir, ckpt_id, "objects.idx"))
+        assert "codec" not in idx["a"]
+        assert idx["a"]["length"] == a.nbytes
+
+        with pytest.raises(ValueError):
+            save_checkpoint("exp-lz4", {"a": a}, tmpdir, compression="zstd")
+
+        monkeypatch.setattr(save_mod, "lz4", None)
+        with pytest.raises(ValueError, match="lz4"):
+            save_checkpoint("exp-lz4", {"a": a}, tmpdir, compression="lz4")
+
+
+def test_numpy_precision_opt_in():
+    if np is None:
+        pytest.skip("NumPy not installed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        a = np.linspace(-1, 1, 1000, dtype=np.float32).reshape(10, 100)
+        b = np.arange(4, dtype=np.int64)
+
+        for precision, tol in (("bf16", 1e-2), ("int8", 1e-2)):
+            ckpt_id = save_checkpoint(
+                "exp-q", {"a": a, "b": b}, tmpdir, precision=precision
+            )
+            ns = {}
+            restore_checkpoint(os.path.join(tmpdir, ckpt_id), ns)
+
+            assert ns["a"].dtype == np.float32
+            assert ns["a"].shape == a.shape
+            assert np.allclose(ns["a"], a, atol=tol)
+            # Non-float32 arrays are stored exactly
+            assert np.array_equal(ns["b"], b)
+
+        with pytest.raises(ValueError):
+            save_checkpoint("exp-q", {"a": a}, tmpdir, precision="fp4")
+
+
 def test_reject_open_file():
     with tempfile.TemporaryDirectory() as tmpdir:
         f = open(__file__, "r")
         try:
-            with pytest.raises(UnserializableError):
+            with pytest.raises(UnserializableError) as exc:
                 save_checkpoint("exp-bad", {"f": f}, tmpdir)
+            assert "open file" in exc.value.details[0][2]
         finally:
             f.close()
 
@@ -138,6 +453,26 @@ def test_reject_generator():
         with pytest.raises(UnserializableError):
             save_checkpoint("exp-gen", {"g": gen}, tmpdir)
 
+        # Nested inside a container as well
+        with pytest.raises(UnserializableError) as exc:
+            save_checkpoint("exp-gen", {"g": [1, {"h": gen}]}, tmpdir)
+        assert "generator" in exc.value.details[0][2]
+
+
+def test_reject_unrestorable_dict_keys():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for bad in ({(1, 2): 3}, [{"ok": {(1,): 2}}]):
+            with pytest.raises(UnserializableError) as exc:
+                save_checkpoint("exp-keys", {"d": bad}, tmpdir)
+            assert "dict keys" in exc.value.details[0][2]
+
+        # Scalar keys other than str are still accepted
+        data = {"d": {1: "a", 2.5: "b", None: "c"}}
+        ckpt_id = save_checkpoint("exp-keys", data, tmpdir)
+        ns = {}
+        restore_checkpoint(os.path.join(tmpdir, ckpt_id), ns)
+        assert ns == data
+
 
 def test_metadata_contains_trace_info(tmp_path):
     from checkpoint.save import save_checkpoint
@@ -170,3 +505,115 @@ def test_metadata_contains_trace_info(tmp_path):
     assert "pid" in meta["environment"]
 
     assert "git_commit" in meta
+
+
+def test_legacy_row_index_restores(tmp_path):
+    ckpt_id = save_checkpoint("exp", {"x": 123, "y": [1, 2]}, str(tmp_path))
+    idx_path = tmp_path / ckpt_id / "objects.idx"
+
+    # Rewrite the index in the original {name: entry} layout
+    legacy = {name: entry for name, entry in read_index(str(idx_path)).items()}
+    idx_path.write_text(json.dumps(legacy))
+
+    ns = {}
+    restore_checkpoint(str(tmp_path / ckpt_id), ns)
+    assert ns == {"x": 123, "y": [1, 2]}
+
+
+@pytest.mark.skipif(not hasattr(os, "writev"), reason="needs os.writev")
+def test_short_writev_is_resumed(tmp_path, monkeypatch):
+    import checkpoint.save as save_mod
+
+    real_writev = os.writev
+
+    def short_writev(fd, buffers):
+        # Write at most 5 bytes per call, splitting chunks mid-way
+        return real_writev(fd, [bytes(buffers[0][:5])])
+
+    monkeypatch.setattr(save_mod, "_IOV_MAX", 2)
+    monkeypatch.setattr(os, "writev", short_writev)
+
+    data = {f"v{i}": "x" * (i * 7) for i in range(10)}
+    ckpt_id = save_checkpoint("exp", data, str(tmp_path))
+
+    ns = {}
+    restore_checkpoint(str(tmp_path / ckpt_id), ns)
+    assert ns == data
+
+
+def _direct_io_results(monkeypatch, save_mod):
+    """Force the O_DIRECT path with tiny limits; record what it returns."""
+    monkeypatch.setattr(save_mod, "_DIRECT_IO_MIN_SIZE", 1)
+    monkeypatch.setattr(save_mod, "_DIRECT_IO_BUFFER", save_mod._DIRECT_IO_ALIGN)
+
+    results = []
+    real_write_direct = save_mod._write_direct
+
+    def write_direct(*args):
+        f = real_write_direct(*args)
+        results.append(f is not None)
+        return f
+
+    monkeypatch.setattr(save_mod, "_write_direct", write_direct)
+    return results
+
+
+@pytest.mark.skipif(not hasattr(os, "O_DIRECT"), reason="needs O_DIRECT")
+def test_direct_io_round_trip(tmp_path, monkeypatch):
+    import checkpoint.save as save_mod
+
+    results = _direct_io_results(monkeypatch, save_mod)
+
+    # Several chunks, odd total size spanning multiple aligned buffers
+    data = {f"v{i}": "x" * (1000 * i + 7) for i in range(1, 6)}
+    ckpt_id = save_checkpoint("exp", data, str(tmp_path))
+
+    ns = {}
+    restore_checkpoint(str(tmp_path / ckpt_id), ns)
+    assert ns == data
+
+    if not results[0]:
+        pytest.skip("filesystem does not support O_DIRECT")
+    blob = tmp_path / ckpt_id / "objects.bin"
+    assert blob.stat().st_size % save_mod._DIRECT_IO_ALIGN != 0
+
+
+@pytest.mark.skipif(not hasattr(os, "O_DIRECT"), reason="needs O_DIRECT")
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_direct_io_closes_fd_on_error(tmp_path, monkeypatch):
+    import checkpoint.save as save_mod
+
+    _direct_io_results(monkeypatch, save_mod)
+
+    def fail(fd, size):
+        raise RuntimeError("simulated failure")
+
+    monkeypatch.setattr(save_mod, "_preallocate", fail)
+
+    before = len(os.listdir("/proc/self/fd"))
+    with pytest.raises(AtomicWriteError):
+        save_checkpoint("exp", {"x": "y" * 5000}, str(tmp_path))
+    assert len(os.listdir("/proc/self/fd")) == before
+
+
+def test_metadata_caller_is_direct_caller(tmp_path):
+    def work():
+        return save_checkpoint("exp-caller", {"x": 1}, str(tmp_path))
+
+    ckpt_id = work()
+    meta = json.loads((tmp_path / ckpt_id / "metadata.json").read_text())
+    assert meta["caller"]["function"] == "work"
+    assert meta["caller"]["file"] == __file__
+
+
+@pytest.mark.skipif(os.name != "posix", reason="needs a removable cwd")
+def test_save_from_deleted_cwd(tmp_path, monkeypatch):
+    gone = tmp_path / "gone"
+    gone.mkdir()
+    monkeypatch.chdir(gone)
+    gone.rmdir()
+
+    out = tmp_path / "out"
+    ckpt_id = save_checkpoint("exp", {"x": 1}, str(out))
+    meta = json.loads((out / ckpt_id / "metadata.json").read_text())
+    assert meta["git_commit"] is None
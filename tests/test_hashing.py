@@ -1,3 +1,5 @@
+import pytest
+
 from pystele.core.hashing import content_hash
 
 
@@ -8,3 +10,16 @@ def test_determinism():
 
 def test_small_difference_changes_hash():
     assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_array_hash_depends_on_values_not_layout():
+    np = pytest.importorskip("numpy")
+    a = np.arange(12, dtype=np.float32).reshape(3, 4)
+    assert content_hash({"a": a}) == content_hash({"a": np.asfortranarray(a)})
+    assert content_hash({"a": a}) != content_hash({"a": a.astype(np.float64)})
+    assert content_hash({"a": a[:, ::2]}) == content_hash({"a": a[:, ::2].copy()})
+
+
+def test_hash_value_is_pinned():
+    # Fixed algorithm: the value must not depend on optional packages
+    assert content_hash({"a": 1, "b": [True, None, 3.14]}) == "e604b8d2a9cafe64"
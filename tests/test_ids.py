@@ -1,5 +1,5 @@
 import re
-from pystele.core.ids import new_execution_id, new_run_id, new_branch_id
+from pystele.core.ids import new_execution_id, new_run_id, new_branch_id, new_ids
 
 REGEX = re.compile(r"^[a-z]+-\d{8}T\d{6}-\w{8}$")
 
@@ -12,3 +12,10 @@ def test_id_format_and_uniqueness():
             assert REGEX.match(v)
             ids.add(v)
     assert len(ids) == 3000
+
+
+def test_new_ids_batch():
+    batch = new_ids("run", 500)
+    assert len(set(batch)) == 500
+    assert all(REGEX.match(v) and v.startswith("run-") for v in batch)
+    assert new_ids("run", 0) == []
@@ -15,3 +15,14 @@ def test_passing_state():
         "storage_path": "/tmp",
     }
     assert check_invariants(state) == []
+
+
+def test_violations_in_declared_order():
+    assert check_invariants({"ids_mutable": True, "version": ""}) == [
+        "commit-log-append-only",
+        "ids-immutable",
+        "snapshot-consistency",
+        "clock-monotonic",
+        "config-version-set",
+        "storage-path-set",
+    ]